@@ -0,0 +1,183 @@
+"""
+Lightweight profiling helpers for the search backend:
+per-request stage timings, a sampling profiler and an event-loop lag monitor
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+import contextvars
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+# Stage timings (ms) of the request currently being handled
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+def start_request_timing() -> dict:
+    """Start collecting stage timings for the current request"""
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+def record_stage(name: str, started: float):
+    """Add the time elapsed since `started` (perf_counter) to a stage of the current request"""
+    timings = _request_timings.get()
+    if timings is not None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        timings[name] = round(timings.get(name, 0.0) + elapsed_ms, 2)
+
+@contextmanager
+def stage(name: str):
+    """Time a block as a named stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, started)
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def sample_stacks(duration: float, interval: float = 0.005) -> str:
+    """
+    Sample the stacks of all threads for `duration` seconds.
+    Returns the profile in folded-stack format ("thread;frame;frame count"),
+    which can be fed directly to flamegraph.pl or speedscope.
+    """
+    own_id = threading.get_ident()
+    counts = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common())
+
+class LoopLagMonitor:
+    """
+    Detect blocking calls on the event loop.
+    A heartbeat task ticks on the loop while a watchdog thread checks it; when the
+    heartbeat stalls past `threshold` seconds the loop thread's stack is captured,
+    which points at the blocking call.
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.2, history: int = 100):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = deque(maxlen=history)
+        self._last_beat = time.monotonic()
+        self._current_stall = None
+        self._stall_lock = threading.Lock()  # _current_stall is shared with the watchdog thread
+        self._loop_thread_id = None
+        self._task = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start monitoring the running event loop"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="loop-lag-monitor", daemon=True).start()
+
+    def stop(self):
+        """Stop monitoring"""
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            now = time.monotonic()
+            with self._stall_lock:
+                stall, self._current_stall = self._current_stall, None
+                if stall is not None:
+                    # Loop is responsive again: record how long it was blocked
+                    stall["lag_ms"] = round((now - self._last_beat - self.interval) * 1000, 2)
+                self._last_beat = now
+            if stall is not None:
+                print(f"Event loop was blocked for {stall['lag_ms']:.0f}ms")
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            last_beat = self._last_beat
+            lag = time.monotonic() - last_beat - self.interval
+            if lag < self.threshold or self._current_stall is not None:
+                continue
+            # Format the stack outside the lock: linecache may hit the disk
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stall = {
+                "detected_at": datetime.now().isoformat(),
+                "lag_ms": round(lag * 1000, 2),
+                "stack": traceback.format_stack(frame) if frame else []
+            }
+            with self._stall_lock:
+                self.stalls.append(stall)
+                # If the loop already resumed, keep the detected lag as the final length
+                if self._last_beat == last_beat:
+                    self._current_stall = stall
+
+class SlowRequestMiddleware:
+    """
+    ASGI middleware that reports requests slower than `threshold_ms`.
+    The clock stops on the final response body message, so streaming responses are
+    timed end to end and their stage timings are complete when `on_slow` is called.
+    """
+
+    def __init__(self, app, threshold_ms: float, on_slow, exclude_prefixes=()):
+        self.app = app
+        self.threshold_ms = threshold_ms
+        self.on_slow = on_slow
+        self.exclude_prefixes = tuple(exclude_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        timings = start_request_timing()
+        started = time.perf_counter()
+        response = {"status_code": None, "finished": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status_code"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response["finished"] = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Requests that fail or disconnect mid-stream are timed up to here
+            finished = response["finished"] or time.perf_counter()
+            total_ms = (finished - started) * 1000
+            if total_ms > self.threshold_ms:
+                params = {}
+                for key, value in parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True):
+                    params.setdefault(key, []).append(value)
+                await self.on_slow({
+                    "time": datetime.now().isoformat(),
+                    "path": scope["path"],
+                    "params": {key: values[0] if len(values) == 1 else values for key, values in params.items()},
+                    "status_code": response["status_code"],
+                    "total_ms": round(total_ms, 2),
+                    # Stages overlap under concurrency (e.g. db_pool_wait sums all enrichment queries)
+                    "stages": timings
+                })
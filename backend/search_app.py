@@ -7,11 +7,17 @@ import os
 import re
 import hashlib
 import asyncio
+import secrets
+import threading
+import time
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 import uvicorn
+import httpx
 from utils import *
+from profiling import LoopLagMonitor, SlowRequestMiddleware, record_stage, sample_stacks, stage
 from typing import List, Optional
 import aiomysql
 
@@ -20,6 +26,23 @@ app = FastAPI()
 
 CACHE_FILE = "data/cache.json"
 
+# Retrieval service endpoints
+ES_RETRIEVE_URL = "http://120.92.112.87:25620/es/retrieve"
+DEEP_SEARCH_URL = "http://120.92.112.87:25620/api/api/retrieval_for_test/search"
+
+# Tiered search budgets (seconds)
+FAST_SEARCH_BUDGET = 2.0
+DEEP_SEARCH_TIMEOUT = 180.0
+
+# Profiling
+SLOW_REQUEST_LOG = "data/slow_requests.jsonl"
+SLOW_REQUEST_THRESHOLD_MS = 3000
+SLOW_REQUEST_LOG_MAX_BYTES = 5 * 1024 * 1024  # Rotated to SLOW_REQUEST_LOG + ".1" beyond this
+slow_request_log_lock = threading.Lock()
+MAX_PROFILE_SECONDS = 60
+loop_lag_monitor = LoopLagMonitor(threshold=0.2)
+profile_lock = asyncio.Lock()  # Only one sampling session at a time
+
 # MySQL Database Configuration
 DB_CONFIG = {
     "host": "152.136.166.243",
@@ -34,6 +57,9 @@ DB_CONFIG = {
 db_pool = None
 db_semaphore = asyncio.Semaphore(10)  # Limit concurrent database queries
 
+# Shared HTTP client for the retrieval services (keeps connections alive)
+http_client = None
+
 async def get_db_pool():
     """Get or create database connection pool"""
     global db_pool
@@ -51,20 +77,39 @@ async def get_db_pool():
         )
     return db_pool
 
+async def get_http_client():
+    """Get or create the pooled HTTP client for the retrieval services"""
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            timeout=DEEP_SEARCH_TIMEOUT,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+        )
+    return http_client
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize connection pool on startup"""
+    """Initialize connection pools on startup"""
     await get_db_pool()
     print("Database connection pool initialized")
+    await get_http_client()
+    print("HTTP client pool initialized")
+    loop_lag_monitor.start()
+    print("Event loop lag monitor started")
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Close connection pool on shutdown"""
-    global db_pool
+    """Close connection pools on shutdown"""
+    global db_pool, http_client
+    loop_lag_monitor.stop()
     if db_pool:
         db_pool.close()
         await db_pool.wait_closed()
         print("Database connection pool closed")
+    if http_client:
+        await http_client.aclose()
+        http_client = None
+        print("HTTP client pool closed")
 
 def load_cache():
     """Load cache from file"""
@@ -91,10 +136,12 @@ def get_cache_key(query, query_understanding, smart_rerank, social_impact, index
 
 async def get_authors_from_db(arxiv_id: str) -> list:
     """Query authors from MySQL database by arxiv_id"""
+    wait_started = time.perf_counter()
     async with db_semaphore:  # Limit concurrent queries
         try:
             pool = await get_db_pool()
             async with pool.acquire() as conn:
+                record_stage("db_pool_wait", wait_started)
                 async with conn.cursor() as cursor:
                     await cursor.execute(
                         "SELECT authors FROM arxiv_papers WHERE arxiv_id = %s",
@@ -111,10 +158,12 @@ async def get_authors_from_db(arxiv_id: str) -> list:
 
 async def get_venue_info_from_db(arxiv_id: str) -> dict:
     """Query venue information from MySQL database by arxiv_id"""
+    wait_started = time.perf_counter()
     async with db_semaphore:  # Limit concurrent queries
         try:
             pool = await get_db_pool()
             async with pool.acquire() as conn:
+                record_stage("db_pool_wait", wait_started)
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
                     await cursor.execute(
                         """
@@ -137,10 +186,12 @@ async def get_venue_info_from_db(arxiv_id: str) -> dict:
 
 async def get_social_impact_from_db(arxiv_id: str) -> dict:
     """Query social media impact from twitter_to_arxiv table in trending database"""
+    wait_started = time.perf_counter()
     async with db_semaphore:  # Limit concurrent queries
         try:
             pool = await get_db_pool()
             async with pool.acquire() as conn:
+                record_stage("db_pool_wait", wait_started)
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
                     await cursor.execute(
                         """
@@ -267,6 +318,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def write_slow_request(entry):
+    """Append a slow request entry, rotating the log once it exceeds SLOW_REQUEST_LOG_MAX_BYTES"""
+    with slow_request_log_lock:
+        os.makedirs(os.path.dirname(SLOW_REQUEST_LOG), exist_ok=True)
+        if os.path.exists(SLOW_REQUEST_LOG) and os.path.getsize(SLOW_REQUEST_LOG) > SLOW_REQUEST_LOG_MAX_BYTES:
+            os.replace(SLOW_REQUEST_LOG, SLOW_REQUEST_LOG + ".1")
+        append_jsonl(entry, SLOW_REQUEST_LOG)
+
+async def log_slow_request(entry):
+    """Log a per-stage timing breakdown for requests slower than SLOW_REQUEST_THRESHOLD_MS"""
+    print(f"Slow request {entry['path']}: {entry['total_ms']:.0f}ms {entry['stages']}")
+    try:
+        await asyncio.to_thread(write_slow_request, entry)
+    except Exception as e:
+        print(f"Error writing slow request log: {e}")
+
+# Pure ASGI middleware so streaming responses are timed until their last chunk
+app.add_middleware(
+    SlowRequestMiddleware,
+    threshold_ms=SLOW_REQUEST_THRESHOLD_MS,
+    on_slow=log_slow_request,
+    exclude_prefixes=("/api/admin/",),  # Profiling sessions are slow by design
+)
+
+def json_response(content) -> Response:
+    """Serialize content as the json_encode stage so large payloads show up in the timings"""
+    with stage("json_encode"):
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return Response(content=body, media_type="application/json")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow access only with the admin token configured in data/api.json"""
+    admin_token = api_dict.get("admin_token")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
 @app.get("/api/config")
 async def get_config():
     """Get configuration data"""
@@ -319,42 +408,112 @@ async def search(query: str = "Agentic Reinforcement Learning"):
         return load_json("data/test_data.json") * 5
 
 
-@app.get("/api/deep_search")
-async def deep_search(
-    query: str = "Agentic Reinforcement Learning",
-    query_understanding: bool = False,
-    smart_rerank: bool = True,
-    use_cache: bool = False,
-    social_impact: bool = False,
-    indexing_fields: Optional[List[str]] = Query(None),
-):
-    import httpx
+def format_es_item(item) -> dict:
+    """Format an Elasticsearch hit into the frontend result shape"""
+    authors = item.get("authors", [])
+    if authors:
+        authors_str = ", ".join([
+            author.get("name", "") if isinstance(author, dict) else str(author)
+            for author in authors
+        ])
+        authors_str = "" if not has_letters(authors_str) else authors_str
+    else:
+        authors_str = ""
+    dates = item.get("dates", [])
+    release_date = format_date(dates[0]) if dates else ""
+    score = item.get("score")
+    return {
+        "title": item.get("title", ""),
+        "abs": item.get("tldr") or item.get("abstract", ""),
+        "authors": authors_str,
+        "orgs": "",
+        "release_date": release_date,
+        "url": item.get("urls", ""),
+        "meta": f"Keyword match: {score:.3f}" if isinstance(score, (int, float)) else "",
+        "social_score": None
+    }
 
-    # Handle indexing fields - default to all if not provided
-    if indexing_fields is None or len(indexing_fields) == 0:
-        indexing_fields = ['metadata', 'introduction', 'section', 'roc']
+async def fetch_fast_results(query: str, topk: int = 50) -> list:
+    """Keyword retrieval from the Elasticsearch service (fast tier)"""
+    client = await get_http_client()
+    payload = {
+        "queries": [query],
+        "topk": topk,
+        "return_scores": True
+    }
+    response = await client.post(
+        ES_RETRIEVE_URL, params={"index": "papers"}, json=payload, timeout=FAST_SEARCH_BUDGET
+    )
+    response.raise_for_status()
+    data = response.json()
+    if data.get("status") != "success":
+        raise RuntimeError(f"ES retrieval failed: {data.get('status')}")
+    return [format_es_item(item) for item in data.get("result", [])]
+
+async def enrich_item(item, social_impact: bool):
+    """Enrich a formatted result with author, venue and social info from the database"""
+    arxiv_id = item.get("arxiv_id", "")
+    if not arxiv_id:
+        return item
     
-    # Generate cache key
-    cache_key = get_cache_key(query, query_understanding, smart_rerank, social_impact, indexing_fields)
+    # Concurrent queries
+    # Check if authors string contains any letters
+    authors_task = get_authors_from_db(arxiv_id) if not item["authors"].strip() else None
+    venue_task = get_venue_info_from_db(arxiv_id)
+    social_task = get_social_impact_from_db(arxiv_id) if social_impact else None
     
-    # Check cache if use_cache is enabled
-    if use_cache:
-        cache = load_cache()
-        if cache_key in cache:
-            print(f"Cache hit for query: {query}")
-            cached_data = cache[cache_key]
-            return {
-                "cache_info": "✓ Using cached result",
-                "results": cached_data["results"],
-                "cached_at": cached_data.get("cached_at", "")
-            }
+    # Gather results
+    tasks = []
+    if authors_task:
+        tasks.append(authors_task)
+    tasks.append(venue_task)
+    if social_task:
+        tasks.append(social_task)
+    
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    # Process authors if needed
+    result_idx = 0
+    if authors_task:
+        authors_from_db = results[result_idx] if not isinstance(results[result_idx], Exception) else []
+        if authors_from_db:
+            item["authors"] = ", ".join(authors_from_db)
+        result_idx += 1
+    
+    # Process venue info
+    venue_info = results[result_idx] if not isinstance(results[result_idx], Exception) else None
+    venue_str = format_venue_info(venue_info)
+    if venue_str:
+        item["meta"] = f"{item['meta']} | {venue_str}"
+    result_idx += 1
+    
+    # Process social impact if requested
+    if social_task:
+        social_data = results[result_idx] if not isinstance(results[result_idx], Exception) else None
+        if social_data:
+            score = calculate_social_score(social_data)
+            item["social_score"] = score
         else:
-            print(f"Cache miss for query: {query}")
-            cache_info = "⚠ No cache found, fetching new results..."
+            item["social_score"] = None
     else:
-        cache_info = None
+        item["social_score"] = None
+    
+    # Remove arxiv_id from final output
+    item.pop("arxiv_id", None)
+    return item
 
-    url = "http://120.92.112.87:25620/api/api/retrieval_for_test/search"
+async def fetch_deep_results(
+    query: str,
+    query_understanding: bool,
+    smart_rerank: bool,
+    social_impact: bool,
+    indexing_fields: List[str],
+    require_success: bool = False,
+) -> list:
+    """
+    Run the retrieval + rerank pipeline and enrich the results (deep tier).
+    An unsuccessful upstream status yields no results, or raises if `require_success` is set.
+    """
     search_funcs = []
 
     # Map frontend parameters to backend parameters
@@ -382,130 +541,130 @@ async def deep_search(
         "search_funcs": search_funcs,
     }
     print(data)
-    try:
-        async with httpx.AsyncClient(timeout=180.0) as client:
-            response = await client.post(url, json=data)
-            # response = json.loads(open("/home/ubuntu/sciagent-demo/data/test_data.json").read())
-            # result = response[0]
-            # print(response)
-            response.raise_for_status()
-            result = response.json()[0]
+    client = await get_http_client()
+    with stage("retrieval"):
+        response = await client.post(DEEP_SEARCH_URL, json=data, timeout=DEEP_SEARCH_TIMEOUT)
+        response.raise_for_status()
+    with stage("json_decode"):
+        result = response.json()[0]
+    if require_success and result.get("status") != "success":
+        raise RuntimeError(f"Deep retrieval failed: {result.get('status')}")
+    
+    # Extract and format the results
+    formatted_results = []
+    if result.get("status") == "success":
+        # First pass: format basic information
+        format_started = time.perf_counter()
+        for item in result["result"]:
+            authors = item.get("authors", [])
+            if authors:
+                authors_str = ", ".join([author.get("name", "") for author in authors])
+                authors_str = "" if not has_letters(authors_str) else authors_str
+                all_orgs = []
+                for author in authors:
+                    all_orgs.extend(author.get("orgs", []))
+                unique_orgs = list(dict.fromkeys(all_orgs))  # 保持顺序去重
+                org_str = ", ".join(unique_orgs)
+                org_str = "" if not has_letters(org_str) else org_str
+            else:
+                authors_str = ""
+                org_str = ""
             
-            # Extract and format the results
-            formatted_results = []
-            if result.get("status") == "success":
-                # First pass: format basic information
-                for item in result["result"]:
-                    authors = item.get("authors", [])
-                    if authors:
-                        authors_str = ", ".join([author.get("name", "") for author in authors])
-                        authors_str = "" if not has_letters(authors_str) else authors_str
-                        all_orgs = []
-                        for author in authors:
-                            all_orgs.extend(author.get("orgs", []))
-                        unique_orgs = list(dict.fromkeys(all_orgs))  # 保持顺序去重
-                        org_str = ", ".join(unique_orgs)
-                        org_str = "" if not has_letters(org_str) else org_str
-                    else:
-                        authors_str = ""
-                        org_str = ""
-                    
-                    # Extract and format date
-                    dates = item.get("dates", [])
-                    release_date = ""
-                    if dates and len(dates) > 0:
-                        release_date = format_date(dates[0])
-                    
-                    formatted_item = {
-                        "title": item.get("title", ""),
-                        "abs": item.get("tldr", ""),
-                        "authors": authors_str,
-                        "orgs": org_str,
-                        "release_date": release_date,
-                        "url": item.get("urls", ""),
-                        "meta": f"Relevance: {item.get('score', '0.0'):.3f}",
-                        "arxiv_id": item.get("arxiv_id", "")
-                    }
-                    formatted_results.append(formatted_item)
-                
-                # Second pass: enrich with database info using concurrent queries
-                async def enrich_item(item):
-                    arxiv_id = item.get("arxiv_id", "")
-                    if not arxiv_id:
-                        return item
-                    
-                    # Concurrent queries
-                    # Check if authors string contains any letters
-                    authors_task = get_authors_from_db(arxiv_id) if not item["authors"].strip() else None
-                    venue_task = get_venue_info_from_db(arxiv_id)
-                    social_task = get_social_impact_from_db(arxiv_id) if social_impact else None
-                    
-                    # Gather results
-                    tasks = []
-                    if authors_task:
-                        tasks.append(authors_task)
-                    tasks.append(venue_task)
-                    if social_task:
-                        tasks.append(social_task)
-                    
-                    results = await asyncio.gather(*tasks, return_exceptions=True)
-                    
-                    # Process authors if needed
-                    result_idx = 0
-                    if authors_task:
-                        authors_from_db = results[result_idx] if not isinstance(results[result_idx], Exception) else []
-                        if authors_from_db:
-                            item["authors"] = ", ".join(authors_from_db)
-                        result_idx += 1
-                    
-                    # Process venue info
-                    venue_info = results[result_idx] if not isinstance(results[result_idx], Exception) else None
-                    venue_str = format_venue_info(venue_info)
-                    if venue_str:
-                        item["meta"] = f"{item['meta']} | {venue_str}"
-                    result_idx += 1
-                    
-                    # Process social impact if requested
-                    if social_task:
-                        social_data = results[result_idx] if not isinstance(results[result_idx], Exception) else None
-                        if social_data:
-                            score = calculate_social_score(social_data)
-                            item["social_score"] = score
-                        else:
-                            item["social_score"] = None
-                    else:
-                        item["social_score"] = None
-                    
-                    # Remove arxiv_id from final output
-                    item.pop("arxiv_id", None)
-                    return item
-                
-                # Enrich all items concurrently
-                formatted_results = await asyncio.gather(*[enrich_item(item) for item in formatted_results])
+            # Extract and format date
+            dates = item.get("dates", [])
+            release_date = ""
+            if dates and len(dates) > 0:
+                release_date = format_date(dates[0])
             
-            # Cache the results
-            cache = load_cache()
-            cache[cache_key] = {
-                "query": query,
-                "parameters": {
-                    "query_understanding": query_understanding,
-                    "smart_rerank": smart_rerank,
-                    "social_impact": social_impact,
-                    "indexing_fields": indexing_fields
-                },
-                "results": formatted_results,
-                "cached_at": datetime.now().isoformat()
+            formatted_item = {
+                "title": item.get("title", ""),
+                "abs": item.get("tldr", ""),
+                "authors": authors_str,
+                "orgs": org_str,
+                "release_date": release_date,
+                "url": item.get("urls", ""),
+                "meta": f"Relevance: {item.get('score', '0.0'):.3f}",
+                "arxiv_id": item.get("arxiv_id", "")
             }
+            formatted_results.append(formatted_item)
+        record_stage("format", format_started)
+        
+        # Second pass: enrich all items concurrently with database info
+        with stage("enrich"):
+            formatted_results = await asyncio.gather(
+                *[enrich_item(item, social_impact) for item in formatted_results]
+            )
+    return list(formatted_results)
+
+def default_indexing_fields(indexing_fields: Optional[List[str]]) -> List[str]:
+    """Default to all indexing fields if none are provided"""
+    if indexing_fields is None or len(indexing_fields) == 0:
+        return ['metadata', 'introduction', 'section', 'roc']
+    return indexing_fields
+
+@app.get("/api/deep_search")
+async def deep_search(
+    query: str = "Agentic Reinforcement Learning",
+    query_understanding: bool = False,
+    smart_rerank: bool = True,
+    use_cache: bool = False,
+    social_impact: bool = False,
+    indexing_fields: Optional[List[str]] = Query(None),
+):
+    # Handle indexing fields - default to all if not provided
+    indexing_fields = default_indexing_fields(indexing_fields)
+    
+    # Generate cache key
+    cache_key = get_cache_key(query, query_understanding, smart_rerank, social_impact, indexing_fields)
+    
+    # Check cache if use_cache is enabled
+    if use_cache:
+        with stage("load_cache"):
+            cache = load_cache()
+        if cache_key in cache:
+            print(f"Cache hit for query: {query}")
+            cached_data = cache[cache_key]
+            return json_response({
+                "cache_info": "✓ Using cached result",
+                "results": cached_data["results"],
+                "cached_at": cached_data.get("cached_at", "")
+            })
+        else:
+            print(f"Cache miss for query: {query}")
+            cache_info = "⚠ No cache found, fetching new results..."
+    else:
+        cache_info = None
+
+    try:
+        formatted_results = await fetch_deep_results(
+            query, query_understanding, smart_rerank, social_impact, indexing_fields
+        )
+        
+        # Cache the results
+        with stage("load_cache"):
+            cache = load_cache()
+        cache[cache_key] = {
+            "query": query,
+            "parameters": {
+                "query_understanding": query_understanding,
+                "smart_rerank": smart_rerank,
+                "social_impact": social_impact,
+                "indexing_fields": indexing_fields
+            },
+            "results": formatted_results,
+            "cached_at": datetime.now().isoformat()
+        }
+        with stage("save_cache"):
             save_cache(cache)
-            
-            # Return results with cache info if applicable
-            if cache_info:
-                return {
-                    "cache_info": cache_info,
-                    "results": formatted_results
-                }
-            else:
-                return formatted_results
+        
+        # Return results with cache info if applicable
+        if cache_info:
+            return json_response({
+                "cache_info": cache_info,
+                "results": formatted_results
+            })
+        else:
+            return json_response(formatted_results)
             
     except Exception as e:
         # Log the error
@@ -513,11 +672,80 @@ async def deep_search(
         # Fallback to test data if API call fails
         fallback_results = load_json("data/test_data.json") * 5
         if cache_info:
-            return {
+            return json_response({
                 "cache_info": cache_info,
                 "results": fallback_results
-            }
-        return fallback_results
+            })
+        return json_response(fallback_results)
+
+@app.get("/api/tiered_search")
+async def tiered_search(
+    query: str = "Agentic Reinforcement Learning",
+    query_understanding: bool = False,
+    smart_rerank: bool = True,
+    social_impact: bool = False,
+    indexing_fields: Optional[List[str]] = Query(None),
+):
+    """
+    Stream fast keyword results first, then replace them with reranked results.
+
+    Fires the Elasticsearch retrieval and the deep rerank pipeline concurrently and
+    streams newline-delimited JSON events:
+      {"stage": "fast", "status": "success" | "timeout" | "error", "results": [...]}
+      {"stage": "deep", "status": "success" | "timeout" | "error", "results": [...]}
+    The deep event only carries results on success; otherwise the client should keep
+    showing the fast results. There is no fallback to static data.
+    """
+    indexing_fields = default_indexing_fields(indexing_fields)
+
+    def event(tier, status, results=None):
+        payload = {"stage": tier, "status": status}
+        if results is not None:
+            payload["results"] = results
+        with stage("json_encode"):
+            return json.dumps(payload, ensure_ascii=False) + "\n"
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        fast_task = asyncio.create_task(fetch_fast_results(query))
+        deep_task = asyncio.create_task(fetch_deep_results(
+            query, query_understanding, smart_rerank, social_impact, indexing_fields,
+            require_success=True
+        ))
+        try:
+            # Fast tier: answer within the budget or report an empty first stage
+            try:
+                fast_results = await asyncio.wait_for(fast_task, FAST_SEARCH_BUDGET)
+                yield event("fast", "success", fast_results)
+            except asyncio.TimeoutError:
+                print(f"Fast search exceeded {FAST_SEARCH_BUDGET}s budget for query: {query}")
+                yield event("fast", "timeout", [])
+            except Exception as e:
+                print(f"Error in fast search: {e}")
+                yield event("fast", "error", [])
+
+            # Deep tier: upgrade the results if the rerank pipeline finishes in time
+            remaining = max(0.0, DEEP_SEARCH_TIMEOUT - (loop.time() - started))
+            try:
+                deep_results = await asyncio.wait_for(deep_task, remaining)
+                yield event("deep", "success", deep_results)
+            except asyncio.TimeoutError:
+                print(f"Deep search exceeded {DEEP_SEARCH_TIMEOUT}s for query: {query}")
+                yield event("deep", "timeout")
+            except Exception as e:
+                print(f"Error in deep search: {e}")
+                yield event("deep", "error")
+        finally:
+            # Client disconnected or stream finished: don't leave work running
+            for task in (fast_task, deep_task):
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # Retrieve the exception so asyncio doesn't log it as unhandled
+                    task.exception()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 @app.get("/api/stats")
 async def get_stats():
@@ -545,5 +773,34 @@ async def get_stats():
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@app.get("/api/admin/profile", dependencies=[Depends(require_admin)])
+async def profile(
+    seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+):
+    """Sample all threads for N seconds and return a folded-stack (flamegraph) profile"""
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profiling session is already running")
+    async with profile_lock:
+        # Sample from a worker thread so the event loop keeps serving requests
+        folded = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    return PlainTextResponse(folded)
+
+@app.get("/api/admin/slow_requests", dependencies=[Depends(require_admin)])
+async def get_slow_requests(limit: int = Query(50, ge=1, le=1000)):
+    """Get the most recent slow requests with their stage timings"""
+    if not os.path.exists(SLOW_REQUEST_LOG):
+        return []
+    return await asyncio.to_thread(load_jsonl_tail, SLOW_REQUEST_LOG, limit)
+
+@app.get("/api/admin/loop_lag", dependencies=[Depends(require_admin)])
+async def get_loop_lag():
+    """Get recent event loop stalls and the stack of the blocking call"""
+    return {
+        "threshold_ms": loop_lag_monitor.threshold * 1000,
+        "stalls": list(loop_lag_monitor.stalls)
+    }
+
+
 if __name__ == '__main__':
     uvicorn.run(app, host="0.0.0.0", port=12312, log_level="info")
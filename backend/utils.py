@@ -1,3 +1,4 @@
+import os
 import json
 import time
 import random
@@ -68,4 +69,31 @@ def save_jsonl(data, filepath):
 
 def load_txt(filepath):
     with open(filepath, 'r', encoding='utf-8') as f:
-        return f.read()
\ No newline at end of file
+        return f.read()
+
+def append_jsonl(item, filepath):
+    with open(filepath, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+def load_jsonl_tail(filepath, limit, block_size=65536):
+    """Load the last `limit` valid lines of a JSONL file without reading all of it, skipping corrupt lines"""
+    items = []
+    with open(filepath, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        start = f.tell()
+        remainder = b''
+        while start > 0 and len(items) < limit:
+            read_size = min(block_size, start)
+            start -= read_size
+            f.seek(start)
+            lines = (f.read(read_size) + remainder).split(b'\n')
+            # First line may be partial until the start of the file is reached
+            remainder = lines.pop(0) if start > 0 else b''
+            for line in reversed(lines):
+                if len(items) == limit:
+                    break
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    continue
+    return items[::-1]
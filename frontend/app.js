@@ -18,6 +18,10 @@ createApp({
       smartRerank: true,
       useCache: true,
       socialImpact: false,
+      tieredSearch: false,
+      tieredSearchId: 0,
+      tieredAbortController: null,
+      hasFastResults: false,
       cacheMessage: '',
       sortBy: 'relevance', // 'relevance' or 'social_impact'
       selectedIndexingFields: ['metadata', 'introduction', 'section', 'roc'],
@@ -97,24 +101,42 @@ createApp({
         this.recommendedQueries = ['Deep Learning', 'Quantum Computing', 'Federated Learning'];
       }
     },
-    async searchPapers(query) {
+    buildSearchParams(query) {
+      const params = new URLSearchParams();
+      params.append('query', query);
+      params.append('query_understanding', this.queryUnderstanding);
+      params.append('smart_rerank', this.smartRerank);
+      params.append('social_impact', this.socialImpact);
+      // Add selected indexing fields as multiple parameters
+      this.selectedIndexingFields.forEach(field => {
+        params.append('indexing_fields', field);
+      });
+      return params;
+    },
+    abortTieredSearch() {
+      // Closing the stream also cancels the rerank pipeline on the server
+      if (this.tieredAbortController) {
+        this.tieredAbortController.abort();
+        this.tieredAbortController = null;
+      }
+    },
+    async searchPapers(query, searchId) {
+      this.abortTieredSearch();
+      if (this.tieredSearch) {
+        return this.searchPapersTiered(query, searchId);
+      }
       try {
         // Build URL with parameters
-        const params = new URLSearchParams();
-        params.append('query', query);
-        params.append('query_understanding', this.queryUnderstanding);
-        params.append('smart_rerank', this.smartRerank);
+        const params = this.buildSearchParams(query);
         params.append('use_cache', this.useCache);
-        params.append('social_impact', this.socialImpact);
-        // Add selected indexing fields as multiple parameters
-        this.selectedIndexingFields.forEach(field => {
-          params.append('indexing_fields', field);
-        });
         
         const url = `${api_url}/deep_search?${params.toString()}`;
         console.log('Deep search URL:', url);
         const response = await fetch(url);
         const data = await response.json();
+        if (searchId !== this.tieredSearchId) {
+          return;
+        }
         
         // Check if response includes cache info
         if (data.cache_info) {
@@ -126,8 +148,83 @@ createApp({
         }
       } catch (error) {
         console.error('Error searching papers:', error);
-        this.results = [];
-        this.cacheMessage = '';
+        if (searchId === this.tieredSearchId) {
+          this.results = [];
+          this.cacheMessage = '';
+        }
+      }
+    },
+    async searchPapersTiered(query, searchId) {
+      const controller = new AbortController();
+      this.tieredAbortController = controller;
+      this.results = [];
+      this.hasFastResults = false;
+      try {
+        const url = `${api_url}/tiered_search?${this.buildSearchParams(query).toString()}`;
+        console.log('Tiered search URL:', url);
+        const response = await fetch(url, { signal: controller.signal });
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        // Read newline-delimited JSON events as they arrive
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) {
+            break;
+          }
+          buffer += decoder.decode(value, { stream: true });
+          const lines = buffer.split('\n');
+          buffer = lines.pop();
+          for (const line of lines) {
+            if (line.trim() && searchId === this.tieredSearchId) {
+              this.handleTierEvent(JSON.parse(line));
+            }
+          }
+        }
+        if (buffer.trim() && searchId === this.tieredSearchId) {
+          this.handleTierEvent(JSON.parse(buffer));
+        }
+      } catch (error) {
+        // Superseded searches are aborted on purpose
+        if (searchId === this.tieredSearchId) {
+          console.error('Error in tiered search:', error);
+          if (this.isLoading) {
+            this.results = [];
+            this.cacheMessage = '';
+          }
+        }
+      } finally {
+        if (this.tieredAbortController === controller) {
+          this.tieredAbortController = null;
+        }
+      }
+    },
+    handleTierEvent(event) {
+      if (event.stage === 'fast') {
+        if (event.status === 'success') {
+          this.results = event.results;
+          this.hasFastResults = event.results.length > 0;
+        }
+        if (this.hasFastResults) {
+          // Show keyword results right away while the rerank is running
+          this.cacheMessage = '⚡ Quick keyword results, refining with smart rerank...';
+          this.isLoading = false;
+        }
+      } else if (event.stage === 'deep') {
+        if (event.status === 'success') {
+          // Replace the fast results with reranked ones
+          this.results = event.results;
+          this.cacheMessage = '';
+          if (this.currentPage > this.totalPages) {
+            this.currentPage = 1;
+          }
+        } else if (this.hasFastResults) {
+          // Keep the fast results on screen
+          this.cacheMessage = '⚠ Smart rerank unavailable, showing quick keyword results';
+        } else {
+          this.cacheMessage = '';
+        }
       }
     },
     async loadStats() {
@@ -143,29 +240,39 @@ createApp({
         return;
       }
       
+      // Results from an older search still running in the background are ignored
+      const searchId = ++this.tieredSearchId;
       this.hasSearched = true;
       this.isLoading = true;
       this.currentPage = 1; // Reset to first page
       
       // Start timer
       this.searchTimer = 0;
+      if (this.timerInterval) {
+        clearInterval(this.timerInterval);
+      }
       this.timerInterval = setInterval(() => {
         this.searchTimer += 0.1;
       }, 100);
       
       // Call searchPapers API
       try {
-        await this.searchPapers(this.searchQuery);
+        await this.searchPapers(this.searchQuery, searchId);
       } catch (error) {
         console.error('Error in handleSearch:', error);
-        this.results = [];
+        if (searchId === this.tieredSearchId) {
+          this.results = [];
+        }
       } finally {
-        this.isLoading = false;
-        
-        // Stop timer
-        if (this.timerInterval) {
-          clearInterval(this.timerInterval);
-          this.timerInterval = null;
+        // A newer search owns the loading state and timer
+        if (searchId === this.tieredSearchId) {
+          this.isLoading = false;
+          
+          // Stop timer
+          if (this.timerInterval) {
+            clearInterval(this.timerInterval);
+            this.timerInterval = null;
+          }
         }
       }
     },
@@ -180,6 +287,8 @@ createApp({
       this.currentPage = 1;
       this.searchTimer = 0;
       this.cacheMessage = '';
+      this.tieredSearchId++;
+      this.abortTieredSearch();
       // Clear timer if running
       if (this.timerInterval) {
         clearInterval(this.timerInterval);